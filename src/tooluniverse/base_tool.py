@@ -1,8 +1,9 @@
-from .utils import extract_function_call_json, evaluate_function_call
+from .utils import extract_function_call_json, evaluate_function_call, compile_tool_validator
 
 class BaseTool:
     def __init__(self, tool_config):
         self.tool_config = tool_config
+        self.validator = compile_tool_validator(tool_config)
 
     def run(self):
         pass
@@ -11,7 +12,7 @@ class BaseTool:
         if isinstance(function_call_json, str):
             function_call_json = extract_function_call_json(function_call_json)
         if function_call_json is not None:
-            return evaluate_function_call(self.tool_config, function_call_json)
+            return evaluate_function_call(self.validator, function_call_json)
         else:
             return False, "Invalid JSON string of function call"
 
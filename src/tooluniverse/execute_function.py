@@ -1,4 +1,4 @@
-from .utils import read_json_list, evaluate_function_call, extract_function_call_json, extract_function_call_json_from_qwen
+from .utils import read_json_list, evaluate_function_call, compile_tool_validator, extract_function_call_json, extract_function_call_json_from_qwen
 import copy
 import json
 import random
@@ -37,6 +37,7 @@ class ToolUniverse:
         # Initialize any necessary attributes here
         self.all_tools = []
         self.all_tool_dict = {}
+        self.tool_validators = {}
         self.tool_category_dicts = {}
         if tool_files is None:
             tool_files = default_tool_files
@@ -85,6 +86,7 @@ class ToolUniverse:
             else:
                 tool_desc_list.append(tool['name']+': '+tool['description'])
             self.all_tool_dict[tool['name']] = tool
+            self.tool_validators[tool['name']] = compile_tool_validator(tool)
         return tool_name_list, tool_desc_list
 
     def prepare_one_tool_prompt(self, tool):
@@ -221,6 +223,10 @@ class ToolUniverse:
             function_name = function_call_json['name']
             if not  function_name in self.all_tool_dict:
                 return False, f"Function name {function_name} not found in loaded tools."
-            return evaluate_function_call(self.all_tool_dict[function_name], function_call_json)
+            # Tools added to all_tool_dict directly have no compiled validator.
+            validator = self.tool_validators.get(function_name)
+            if validator is None:
+                return evaluate_function_call(self.all_tool_dict[function_name], function_call_json)
+            return evaluate_function_call(validator, function_call_json)
         else:
             return False, "\033[91mInvalid JSON string of function call\033[0m"
@@ -1,11 +1,149 @@
+import functools
+import logging
+import mmap
+import os
+import re
+import sys
 import yaml
 import json
+from types import MappingProxyType
+
+_log = logging.getLogger(__name__)
+
+# orjson parses only the tool files bundled in the package's data directory.
+# User tool files and LLM output go through json.loads: orjson turns integers
+# beyond 64 bits into floats and rejects lone surrogates and NaN/Infinity,
+# which json.loads accepts.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_BUNDLED_DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
+
+# All delimiters the function-call extractors look for, matched in a single scan.
+_TAG_RE = re.compile(
+    r'<tool_call>|</tool_call>|\[TOOL_CALLS\]|</s>|<\|eom_id\|>'
+    r'|<functioncall>|</functioncall>|<think>|</think>')
+
+
+# Bundled JSON files at least this large are memory-mapped and parsed in place by orjson.
+_MMAP_THRESHOLD = 1 << 20
+
+# JSON numbers without a fractional part decode to int, so "number" accepts both.
+# bool subclasses int but is not a number; the type checks reject it explicitly.
+_NUMBER_TYPES = (int, float)
+
+# JSON-schema parameter types and the Python types accepted for them.
+_TYPE_MAP = MappingProxyType({
+    "string": str,
+    "integer": int,
+    "number": _NUMBER_TYPES,
+    "boolean": bool,
+    "array": list,
+    "object": dict
+})
+
+
+# Argument-name sets remembered per ToolValidator.
+_KEYS_MEMO_SIZE = 64
+
+
+def _find_tags(text):
+    """
+    Locate the first occurrence of every known delimiter in one pass.
+
+    Returns:
+        dict: Mapping of tag to its first offset; use ``.get(tag, -1)`` like ``str.find``.
+    """
+    offsets = {}
+    for match in _TAG_RE.finditer(text):
+        offsets.setdefault(match.group(), match.start())
+    return offsets
+
+
+def _join_output(lst):
+    """
+    Return LLM output as one string, without copying when it already is one.
+    """
+    if isinstance(lst, str):
+        return lst
+    if isinstance(lst, (list, tuple)) and len(lst) == 1 and isinstance(lst[0], str):
+        return lst[0]
+    return ''.join(lst)
+
+
+def _looks_like_json(text):
+    """
+    Cheap check of whether ``text`` could be a JSON document, so callers can
+    skip parse attempts that are bound to raise.
+    """
+    text = text.lstrip()
+    # json.loads also accepts the NaN and Infinity literals.
+    return bool(text) and text[0] in '{["-0123456789tfnNI'
+
+
+def _file_cache_key(file_path):
+    # Files are re-parsed only when their modification time or size changes.
+    st = os.stat(file_path)
+    return os.path.abspath(file_path), st.st_mtime_ns, st.st_size
+
+
+@functools.lru_cache(maxsize=128)
+def _load_yaml_cached(file_path, mtime_ns, size):
+    with open(file_path, 'rb') as file:
+        return yaml.load(file, Loader=_YamlLoader)
+
+
+def _intern_tool_names(tools):
+    # Interned names let name and parameter lookups compare by identity.
+    for tool in tools:
+        if not isinstance(tool, dict):
+            continue
+        if isinstance(tool.get("name"), str):
+            tool["name"] = sys.intern(tool["name"])
+        parameter = tool.get("parameter")
+        if isinstance(parameter, dict) and isinstance(parameter.get("properties"), dict):
+            parameter["properties"] = {
+                sys.intern(key): value for key, value in parameter["properties"].items()}
+    return tools
+
+
+@functools.lru_cache(maxsize=128)
+def _load_json_cached(file_path, mtime_ns, size):
+    # file_path is absolute (see _file_cache_key).
+    use_orjson = orjson is not None and os.path.dirname(file_path) == _BUNDLED_DATA_DIR
+    with open(file_path, 'rb') as file:
+        if use_orjson and size >= _MMAP_THRESHOLD:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped, \
+                    memoryview(mapped) as view:
+                data = orjson.loads(view)
+        elif use_orjson:
+            data = orjson.loads(file.read())
+        else:
+            data = json.loads(file.read())
+    if isinstance(data, list):
+        _intern_tool_names(data)
+    return data
 
 
 def yaml_to_dict(yaml_file_path):
     """
     Convert a YAML file to a dictionary.
 
+    Parsed results are cached per file until it changes on disk; the returned
+    object is shared between calls and should be treated as read-only.
+
     Args:
         yaml_file_path (str): Path to the YAML file.
 
@@ -13,9 +151,7 @@ def yaml_to_dict(yaml_file_path):
         dict: Dictionary representation of the YAML file content.
     """
     try:
-        with open(yaml_file_path, 'r') as file:
-            yaml_dict = yaml.safe_load(file)
-            return yaml_dict
+        return _load_yaml_cached(*_file_cache_key(yaml_file_path))
     except FileNotFoundError:
         print(f"File not found: {yaml_file_path}")
     except yaml.YAMLError as exc:
@@ -26,56 +162,171 @@ def read_json_list(file_path):
     """
     Reads a list of JSON objects from a file.
 
+    Parsed results are cached per file until it changes on disk. A list is
+    returned as a fresh copy, but the tool dictionaries in it are shared between
+    calls and should not be modified in place. Any other top-level JSON value
+    is returned as parsed, shared between calls, and should be treated as
+    read-only.
+
     Parameters:
     file_path (str): The path to the JSON file.
 
     Returns:
     list: A list of dictionaries containing the JSON objects.
     """
-    with open(file_path, 'r') as file:
-        data = json.load(file)
-    return data
+    data = _load_json_cached(*_file_cache_key(file_path))
+    return list(data) if isinstance(data, list) else data
 
 
-def evaluate_function_call(tool_definition, function_call):
-    # Map for type conversion
-    type_map = {
-        "string": str,
-        "integer": int,
-        "number": float,
-        "boolean": bool,
-        "array": list,
-        "object": dict
-    }
+def read_json_list_stream(file_path):
+    """
+    Iterate over the JSON objects of a list stored in a file.
+
+    With ijson installed the file is parsed incrementally, so only one object
+    is materialised at a time; this suits loaders that filter or index tools
+    without keeping the whole list. Without ijson the file is parsed whole.
+
+    Parameters:
+    file_path (str): The path to the JSON file.
+
+    Yields:
+    dict: The JSON objects of the list, in file order.
+    """
+    if ijson is None:
+        yield from read_json_list(file_path)
+        return
+    with open(file_path, 'rb') as file:
+        yield from ijson.items(file, 'item', use_float=True)
+
+
+class ToolValidator:
+    """
+    Pre-compiled form of a tool definition for validating function calls.
+
+    Everything that depends only on the tool definition (required parameters,
+    expected Python types) is computed once, so validating a call only has to
+    look at the call's arguments.
+    """
+
+    def __init__(self, name, required_params, type_names, types):
+        self.name = name
+        # Required parameters in definition order, used for error messages.
+        self.required_params = required_params
+        self.required = frozenset(required_params)
+        # JSON-schema type name per parameter, used for error messages.
+        self.type_names = type_names
+        # Python type per parameter; None when the schema type is unsupported.
+        self.types = types
+        self.params = frozenset(types)
+        # Agents tend to reuse the same argument names, so remember which
+        # argument-name sets passed the required/unknown parameter checks.
+        self._keys_memo = {}
+
+    def keys_valid(self, keys):
+        """
+        Check a frozenset of argument names: True if every required parameter
+        is present and nothing that is not a parameter is passed.
+        """
+        result = self._keys_memo.get(keys)
+        if result is None:
+            result = self.required <= keys <= self.params
+            if len(self._keys_memo) < _KEYS_MEMO_SIZE:
+                self._keys_memo[keys] = result
+        return result
+
+
+def compile_tool_validator(tool_definition):
+    """
+    Build a ToolValidator from a tool definition.
+
+    Args:
+        tool_definition (dict): Tool definition with ``name`` and ``parameter.properties``.
+
+    Returns:
+        ToolValidator: Validator that can be passed to ``evaluate_function_call``.
+    """
+    properties = tool_definition["parameter"]["properties"] or {}
+    required_params = tuple(
+        key for key, value in properties.items() if value.get("required", False))
+    type_names = {key: value.get("type") for key, value in properties.items()}
+    types = {key: _TYPE_MAP.get(type_name) for key, type_name in type_names.items()}
+    return ToolValidator(tool_definition["name"], required_params, type_names, types)
+
 
+def _validate_with_validator(validator, function_call):
+    # Check if the function name matches
+    if validator.name != function_call["name"]:
+        return False, "Function name does not match."
+
+    arguments = function_call["arguments"]
+    keys_valid = validator.keys_valid(frozenset(arguments))
+    if not keys_valid:
+        # Check if all required parameters are present
+        missing = validator.required.difference(arguments)
+        if missing:
+            missing_params = [
+                param for param in validator.required_params if param in missing]
+            return False, f"Missing required parameters: {missing_params}"
+
+    # Check if all provided parameters are valid and their data types are correct
+    types = validator.types
+    invalid_params = []
+    type_mismatches = []
+
+    for param, value in arguments.items():
+        if not keys_valid and param not in types:
+            invalid_params.append(param)
+        else:
+            expected_type = types[param]
+            if expected_type is None:
+                return False, f"Unsupported parameter type: {validator.type_names[param]}"
+            # Exact JSON types match by identity; isinstance covers the rest
+            # (bool for integer, int for number, subclasses), except bool for number.
+            value_type = type(value)
+            if value_type is not expected_type and (
+                    not isinstance(value, expected_type)
+                    or (value_type is bool and expected_type is _NUMBER_TYPES)):
+                type_mismatches.append(
+                    (param, validator.type_names[param], type(value).__name__))
+
+    return _validation_result(invalid_params, type_mismatches)
+
+
+def _validate_with_definition(tool_definition, function_call):
     # Check if the function name matches
     if tool_definition["name"] != function_call["name"]:
         return False, "Function name does not match."
 
     # Check if all required parameters are present
-    required_params = [key for key, value in tool_definition["parameter"]
-                       ["properties"].items() if value.get("required", False)]
-    missing_params = [
-        param for param in required_params if param not in function_call["arguments"]]
+    properties = tool_definition["parameter"]["properties"] or {}
+    arguments = function_call["arguments"]
+    missing_params = [key for key, value in properties.items()
+                      if value.get("required", False) and key not in arguments]
     if missing_params:
         return False, f"Missing required parameters: {missing_params}"
 
     # Check if all provided parameters are valid and their data types are correct
-    valid_params = tool_definition["parameter"]["properties"]
     invalid_params = []
     type_mismatches = []
 
-    for param, value in function_call["arguments"].items():
-        if param not in valid_params:
+    for param, value in arguments.items():
+        if param not in properties:
             invalid_params.append(param)
         else:
-            expected_type = valid_params[param]["type"]
-            if expected_type not in type_map:
-                return False, f"Unsupported parameter type: {expected_type}"
-            if not isinstance(value, type_map[expected_type]):
-                type_mismatches.append(
-                    (param, expected_type, type(value).__name__))
+            type_name = properties[param].get("type")
+            expected_type = _TYPE_MAP.get(type_name)
+            if expected_type is None:
+                return False, f"Unsupported parameter type: {type_name}"
+            value_type = type(value)
+            if value_type is not expected_type and (
+                    not isinstance(value, expected_type)
+                    or (value_type is bool and expected_type is _NUMBER_TYPES)):
+                type_mismatches.append((param, type_name, value_type.__name__))
+
+    return _validation_result(invalid_params, type_mismatches)
 
+
+def _validation_result(invalid_params, type_mismatches):
     if invalid_params:
         return False, f"Invalid parameters provided: {invalid_params}"
 
@@ -84,16 +335,41 @@ def evaluate_function_call(tool_definition, function_call):
 
     return True, "Function call is valid."
 
+
+def evaluate_function_call(tool_definition, function_call):
+    """
+    Check a function call against a tool definition.
+
+    Pass a ToolValidator when the same tool is checked repeatedly. A raw
+    tool definition is checked directly, because compiling a validator for a
+    single call would cost more than the check itself.
+
+    Args:
+        tool_definition (dict or ToolValidator): Tool definition, or a validator
+            compiled from it with ``compile_tool_validator``.
+        function_call (dict): Function call with ``name`` and ``arguments``.
+
+    Returns:
+        tuple: (is_valid, message)
+    """
+    if isinstance(tool_definition, ToolValidator):
+        return _validate_with_validator(tool_definition, function_call)
+    return _validate_with_definition(tool_definition, function_call)
+
+
 def evaluate_function_call_from_toolbox(toolbox, function_call):
     tool_name = function_call["name"]
+    # Use the toolbox's compiled validator when it keeps one (ToolUniverse does).
+    validator = getattr(toolbox, "tool_validators", {}).get(tool_name)
+    if validator is not None:
+        return evaluate_function_call(validator, function_call)
     this_tool_dec = toolbox.get_one_tool_by_one_name(tool_name)
     if this_tool_dec is None:
         return False, "Tool not found."
-    results, results_message = evaluate_function_call(this_tool_dec, function_call)
-    return results, results_message
-    
+    return evaluate_function_call(this_tool_dec, function_call)
+
 
-def compare_function_calls(pred_function_call, gt_function_call, compare_arguments=True, compare_value=True):
+def compare_function_calls(pred_function_call, gt_function_call, compare_arguments=True, compare_value=True, first_only=False):
     # Extracting the name and arguments from the predicted function call
     pred_name = pred_function_call["name"]
     pred_arguments = pred_function_call["arguments"]
@@ -108,16 +384,19 @@ def compare_function_calls(pred_function_call, gt_function_call, compare_argumen
 
     if compare_arguments:
         # Compare arguments
-        if set(pred_arguments.keys()) != set(gt_arguments.keys()):
-            missing_in_pred = set(gt_arguments.keys()) - set(pred_arguments.keys())
-            missing_in_gt = set(pred_arguments.keys()) - set(gt_arguments.keys())
+        if pred_arguments.keys() != gt_arguments.keys():
+            diff = gt_arguments.keys() ^ pred_arguments.keys()
+            missing_in_pred = {key for key in diff if key in gt_arguments}
+            missing_in_gt = diff - missing_in_pred
             return False, f"Argument keys do not match. Missing in predicted: {missing_in_pred}, Missing in ground truth: {missing_in_gt}"
-    if compare_value:
-        # Compare argument values
+    if compare_value and pred_arguments != gt_arguments:
+        # Compare argument values; with first_only, stop at the first mismatch
         mismatched_values = []
         for key in pred_arguments:
             if pred_arguments[key] != gt_arguments[key]:
                 mismatched_values.append((key, pred_arguments[key], gt_arguments[key]))
+                if first_only:
+                    break
 
         if mismatched_values:
             return False, f"Argument values do not match: {mismatched_values}"
@@ -130,46 +409,50 @@ def extract_function_call_json(lst, return_message=False, verbose=True):
         if return_message:
             return lst, ""
         return lst
-    result_str = ''.join(lst)
+    result_str = _join_output(lst)
     if verbose:
-        print("\033[1;34mPossible LLM outputs for function call:\033[0m", result_str)
-    try:
-        function_call_json = json.loads(result_str.strip())
-        if return_message:
-            return function_call_json, ""
-        return function_call_json
-    except json.JSONDecodeError:
+        _log.debug("Possible LLM outputs for function call: %s", result_str)
+    if _looks_like_json(result_str):
         try:
-            index_start = result_str.find(
-                '[TOOL_CALLS]') 
-            index_end = result_str.find('</s>')
-            if index_end == -1:
-                index_end = result_str.find('<|eom_id|>')
-            if index_end == -1:
-                function_call_str = result_str[index_start+ len('[TOOL_CALLS]'):]
-            else:
-                function_call_str = result_str[index_start+ len('[TOOL_CALLS]'):index_end]
-            # print("function_call_str", function_call_str)
+            function_call_json = json.loads(result_str.strip())
+            if return_message:
+                return function_call_json, ""
+            return function_call_json
+        except json.JSONDecodeError:
+            pass
+    tags = _find_tags(result_str)
+    if '[TOOL_CALLS]' in tags:
+        try:
+            message, _, tail = result_str.partition('[TOOL_CALLS]')
+            function_call_str, sep, _ = tail.partition('</s>')
+            if not sep:
+                function_call_str = tail.partition('<|eom_id|>')[0]
             function_call_json = json.loads(function_call_str.strip())
             if return_message:
-                message = result_str[:index_start]
                 return function_call_json, message
             return function_call_json
         except json.JSONDecodeError:
+            pass
+    if verbose:
+        _log.debug("Multiple function calls not implemented for 'llama' format.")
+    if '<functioncall>' in tags:
+        tail = result_str.partition('<functioncall>')[2]
+        function_call_str, sep, _ = tail.partition('</functioncall>')
+        if sep:
             try:
-                print("Multiple function calls not implemented for 'llama' format.")
-                index_start = result_str.find(
-                    '<functioncall>') + len('<functioncall>')
-                index_end = result_str.find('</functioncall>')
-                function_call_str = result_str[index_start:index_end]
                 # function_call_str = function_call_str.replace("'", '"')
                 function_call_json = json.loads(function_call_str.strip())
                 return function_call_json
             except json.JSONDecodeError as e:
-                print("Not a function call:", e)
-                if return_message:
-                    return None, result_str
-                return None
+                if verbose:
+                    _log.debug("Not a function call: %s", e)
+        elif verbose:
+            _log.debug("Not a function call: unterminated <functioncall> tag.")
+    elif verbose:
+        _log.debug("Not a function call: no function call tags found.")
+    if return_message:
+        return None, result_str
+    return None
 
 
 def extract_function_call_json_from_qwen(lst, return_message=False, return_think=True, verbose=True):
@@ -184,7 +467,7 @@ def extract_function_call_json_from_qwen(lst, return_message=False, return_think
         lst: 输入列表或字符串
         return_message: 是否返回消息内容
         return_think: 是否返回带<think>标签的内容，False时只返回</think>到<tool_call>之间的信息
-        verbose: 是否打印调试信息
+        verbose: 是否记录调试日志（logging DEBUG级别）
         
     Returns:
         tuple: (function_call_json, message) 或 function_call_json
@@ -195,106 +478,97 @@ def extract_function_call_json_from_qwen(lst, return_message=False, return_think
         return lst
     
     # 合并列表为字符串
-    result_str = ''.join(lst)
+    result_str = _join_output(lst)
     
     if verbose:
-        print("\033[1;34mQwen LLM outputs for function call:\033[0m", result_str)
+        _log.debug("Qwen LLM outputs for function call: %s", result_str)
     # import pdb; pdb.set_trace()
-    try:
-        # 1. 尝试直接解析JSON（如果整个字符串就是JSON）
-        function_call_json = json.loads(result_str.strip())
-        if return_message:
-            return function_call_json, ""
-        return function_call_json
-    except json.JSONDecodeError:
-        pass
-    
+    if _looks_like_json(result_str):
+        try:
+            # 1. 尝试直接解析JSON（如果整个字符串就是JSON）
+            function_call_json = json.loads(result_str.strip())
+            if return_message:
+                return function_call_json, ""
+            return function_call_json
+        except json.JSONDecodeError:
+            pass
+
+    tags = _find_tags(result_str)
+
     try:
         # 2. 尝试提取 <tool_call> 格式
-        tool_call_start = result_str.find('<tool_call>')
-        tool_call_end = result_str.find('</tool_call>')
-        
-        if tool_call_start != -1 and tool_call_end != -1:
-            # 提取tool_call标签内的JSON内容
-            json_start = tool_call_start + len('<tool_call>')
-            function_call_str = result_str[json_start:tool_call_end].strip()
-            
-            # 解析JSON
-            function_call_json = json.loads(function_call_str)
+        if '<tool_call>' in tags:
+            head, _, tail = result_str.partition('<tool_call>')
+            function_call_str, sep, _ = tail.partition('</tool_call>')
+            if sep:
+                # 解析tool_call标签内的JSON内容
+                function_call_json = json.loads(function_call_str.strip())
             
-            if return_message:
-                # 提取think部分和think之后的内容作为消息
-                think_start = result_str.find('<think>')
-                think_end = result_str.find('</think>')
-                if think_start != -1 and think_end != -1:
-                    if return_think:
-                        # 保留<think>标签，并包含think之后到tool_call之前的所有内容
-                        message = result_str[think_start:tool_call_start].strip()
+                if return_message:
+                    # 提取think部分和think之后的内容作为消息
+                    think_start = tags.get('<think>', -1)
+                    think_end = tags.get('</think>', -1)
+                    if think_start != -1 and think_end != -1:
+                        if return_think:
+                            # 保留<think>标签，并包含think之后到tool_call之前的所有内容
+                            message = head[think_start:].strip()
+                        else:
+                            # 只返回</think>到<tool_call>之间的信息
+                            message = head[think_end + len('</think>'):].strip()
                     else:
-                        # 只返回</think>到<tool_call>之间的信息
-                        message = result_str[think_end + len('</think>'):tool_call_start].strip()
-                else:
-                    # 如果没有think标签，返回tool_call之前的内容
-                    message = result_str[:tool_call_start].strip()
+                        # 如果没有think标签，返回tool_call之前的内容
+                        message = head.strip()
                 
-                return function_call_json, message
+                    return function_call_json, message
             
-            return function_call_json
+                return function_call_json
             
     except json.JSONDecodeError as e:
         if verbose:
-            print(f"Failed to parse JSON in <tool_call>: {e}")
+            _log.debug("Failed to parse JSON in <tool_call>: %s", e)
     
     try:
         # 3. 尝试提取 [TOOL_CALLS] 格式（兼容原有格式）
-        index_start = result_str.find('[TOOL_CALLS]')
-        if index_start != -1:
-            index_end = result_str.find('</s>')
-            if index_end == -1:
-                index_end = result_str.find('<|eom_id|>')
-            if index_end == -1:
-                function_call_str = result_str[index_start + len('[TOOL_CALLS]'):]
-            else:
-                function_call_str = result_str[index_start + len('[TOOL_CALLS]'):index_end]
+        if '[TOOL_CALLS]' in tags:
+            head, _, tail = result_str.partition('[TOOL_CALLS]')
+            function_call_str, end_sep, _ = tail.partition('</s>')
+            if not end_sep:
+                function_call_str = tail.partition('<|eom_id|>')[0]
             
             function_call_json = json.loads(function_call_str.strip())
             
             if return_message:
-                message = result_str[:index_start]
-                return function_call_json, message
+                return function_call_json, head
             return function_call_json
             
     except json.JSONDecodeError as e:
         if verbose:
-            print(f"Failed to parse JSON in [TOOL_CALLS]: {e}")
+            _log.debug("Failed to parse JSON in [TOOL_CALLS]: %s", e)
     
     try:
         # 4. 尝试提取 <functioncall> 格式（兼容原有格式）
-        index_start = result_str.find('<functioncall>')
-        if index_start != -1:
-            index_start += len('<functioncall>')
-            index_end = result_str.find('</functioncall>')
-            if index_end != -1:
-                function_call_str = result_str[index_start:index_end]
+        if '<functioncall>' in tags:
+            head, _, tail = result_str.partition('<functioncall>')
+            function_call_str, sep, _ = tail.partition('</functioncall>')
+            if sep:
                 function_call_json = json.loads(function_call_str.strip())
-                
+            
                 if return_message:
-                    message = result_str[:result_str.find('<functioncall>')]
-                    return function_call_json, message
+                    return function_call_json, head
                 return function_call_json
                 
     except json.JSONDecodeError as e:
         if verbose:
-            print(f"Failed to parse JSON in <functioncall>: {e}")
+            _log.debug("Failed to parse JSON in <functioncall>: %s", e)
     
     # 5. 所有格式都失败，但检查是否有think标签
     if verbose:
-        print("Not a valid function call format for Qwen")
+        _log.debug("Not a valid function call format for Qwen")
     
     if return_message:
         # 检查是否有think标签，如果有则提取think标签及其后的内容
-        think_start = result_str.find('<think>')
-        think_end = result_str.find('</think>')
+        think_start = tags.get('<think>', -1)
+        think_end = tags.get('</think>', -1)
         if think_start != -1 and think_end != -1:
             if return_think:
                 # 保留<think>标签，并包含think之后的所有内容